@@ -4,227 +4,978 @@ Convert Beat This! PyTorch checkpoint to ONNX format
 """
 import sys
 import os
+import logging
+
+# Let MKL/OpenMP use every core for the forward passes run while tracing;
+# this has to be set before torch is imported to take effect
+CPU_COUNT = os.cpu_count() or 1
+os.environ.setdefault('OMP_NUM_THREADS', str(CPU_COUNT))
+
 import torch
 import torch.onnx
 import onnx
 import numpy as np
+import json
+import pickle
 import urllib.request
+import hashlib
+import glob
+import shutil
+import subprocess
+
+logger = logging.getLogger('beat_this.onnx')
 
 # Add the local beat_this module to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'beat_this'))
 
 try:
     from beat_this.model.pl_module import BeatThis
-    print("Successfully imported BeatThis from local beat_this module")
 except ImportError as e:
-    print(f"Failed to import from local beat_this module: {e}")
-    print("Make sure the beat_this submodule is properly initialized")
+    logger.error(f"Failed to import from local beat_this module: {e}")
+    logger.error("Make sure the beat_this submodule is properly initialized")
     sys.exit(1)
 
 # Model URL from the working guide
 MODEL_URL = "https://cloud.cp.jku.at/public.php/dav/files/7ik4RrBKTS273gp/final0.ckpt"
+DOWNLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Opset 14 is the minimum for scaled_dot_product_attention; opset 17 adds a
+# native LayerNormalization op instead of a ReduceMean/Sub/Pow/Sqrt/Div chain.
+# The dynamo exporter builds its graphs at opset 18 and can only reliably
+# down-convert them, so lower opsets require the legacy exporter.
+DEFAULT_OPSET = 18
+DYNAMO_MIN_OPSET = 18
 
-def convert_checkpoint_to_onnx(checkpoint_path, output_path, verbose=False):
+# Name of the extra file in a --script-cache module identifying its checkpoint
+SCRIPT_CACHE_FINGERPRINT = 'checkpoint.json'
+
+def sibling_path(output_path, suffix):
+    """Return output_path with suffix inserted before the .onnx extension"""
+    root, ext = os.path.splitext(output_path)
+    return f"{root}{suffix}{ext}"
+
+def save_model(onnx_model, path, external_data=False):
     """
-    Convert Beat This! PyTorch checkpoint to ONNX format
+    Save onnx_model to path, optionally with all initializers moved to a
+    single <path>.data file next to it
     
-    Args:
-        checkpoint_path: Path to PyTorch checkpoint
-        output_path: Path for output ONNX model
-        verbose: Enable verbose logging
+    External data avoids the 2 GB protobuf limit and lets runtimes mmap the
+    weights instead of parsing them out of the protobuf.
     """
+    if not external_data:
+        onnx.save_model(onnx_model, path)
+        return
     
-    if verbose:
-        print(f"🔧 Configuration:")
-        print(f"  - Checkpoint: {checkpoint_path}")
-        print(f"  - Output: {output_path}")
-        print(f"  - Verbose: {verbose}")
-        print()
+    location = os.path.basename(path) + '.data'
+    data_path = os.path.join(os.path.dirname(path), location)
+    # onnx appends to an existing data file, so start from an empty one
+    if os.path.exists(data_path):
+        os.remove(data_path)
+    onnx.save_model(
+        onnx_model,
+        path,
+        save_as_external_data=True,
+        all_tensors_to_one_file=True,
+        location=location,
+        size_threshold=1024,
+        convert_attribute=False
+    )
+
+def write_metadata(model_path, **fields):
+    """Write a JSON file next to model_path describing how it was produced"""
+    metadata_path = os.path.splitext(model_path)[0] + '.json'
+    with open(metadata_path, 'w') as f:
+        json.dump(fields, f, indent=2)
+    return metadata_path
+
+# Chunk size of the C++ implementation; calibration spectrograms are cropped
+# or zero-padded to this many frames because the histogram calibrators can
+# only merge activations of equal shape
+CALIBRATION_FRAMES = 1500
+
+def fit_frames(spectrogram, frames=CALIBRATION_FRAMES):
+    """
+    Crop or zero-pad a (time_frames, 128) spectrogram to exactly frames frames
+    """
+    if len(spectrogram) >= frames:
+        return spectrogram[:frames]
+    padding = np.zeros((frames - len(spectrogram), spectrogram.shape[1]), dtype=spectrogram.dtype)
+    return np.concatenate([spectrogram, padding])
+
+def create_calibration_reader(calibration_dir, frames=CALIBRATION_FRAMES):
+    """
+    Create a reader feeding the .npy mel spectrograms in calibration_dir to the static quantizer
     
-    print(f"Loading checkpoint from: {checkpoint_path}")
+    Each file holds a single (time_frames, 128) spectrogram, as produced by
+    the MelSpectrogram stage of the C++ implementation.
+    """
+    from onnxruntime.quantization import CalibrationDataReader
     
-    # Load the checkpoint
+    class MelCalibReader(CalibrationDataReader):
+        def __init__(self):
+            self.files = sorted(glob.glob(os.path.join(calibration_dir, '*.npy')))
+            if not self.files:
+                raise ValueError(f"No .npy files found in calibration directory: {calibration_dir}")
+            self.rewind()
+        
+        def get_next(self):
+            path = next(self.iterator, None)
+            if path is None:
+                return None
+            spectrogram = fit_frames(np.load(path).astype(np.float32), frames)
+            return {'input_spectrogram': spectrogram[None, :, :]}
+        
+        def rewind(self):
+            self.iterator = iter(self.files)
+    
+    return MelCalibReader()
+
+def simplify_model(output_path, external_data=False):
+    """
+    Fold constants and redundant shape computations of the exported model in place
+    
+    The time axis stays dynamic: the simplified graph is compared against
+    the original on one random input of the dummy input shape, which does
+    not overwrite the model input.
+    """
+    try:
+        logger.info("Simplifying ONNX model...")
+        
+        import onnxsim
+        
+        onnx_model = onnx.load(output_path, load_external_data=True)
+        simplified_model, check_ok = onnxsim.simplify(
+            onnx_model,
+            check_n=1,
+            test_input_shapes={'input_spectrogram': [1, 300, 128]}
+        )
+        if not check_ok:
+            raise RuntimeError("Simplified model failed the onnxsim consistency check")
+        save_model(simplified_model, output_path, external_data)
+        
+        logger.info("ONNX model simplification completed")
+        logger.debug(f"  - Graph nodes: {len(onnx_model.graph.node)} -> {len(simplified_model.graph.node)}")
+    except Exception as e:
+        logger.error(f"Error during ONNX simplification: {e}")
+        logger.debug("Full traceback:", exc_info=True)
+        return False
+    
+    return True
+
+# Standard ONNX dimension denotations of the model inputs and outputs
+DIMENSION_DENOTATIONS = {
+    'input_spectrogram': ['DATA_BATCH', 'DATA_TIME', 'DATA_FEATURE'],
+    'beat': ['DATA_BATCH', 'DATA_TIME'],
+    'downbeat': ['DATA_BATCH', 'DATA_TIME'],
+}
+
+def annotate_dimensions(output_path, external_data=False):
+    """
+    Add dimension denotations to the inputs and outputs of the exported model
+    
+    Execution providers such as DirectML cannot specialize free dimensions
+    without a denotation or override and fall back to CPU round trips around
+    shape computations. The denotations let deployments pin the batch/time
+    dimensions with SessionOptions::AddFreeDimensionOverride.
+    """
+    try:
+        onnx_model = onnx.load(output_path, load_external_data=True)
+        for value_info in list(onnx_model.graph.input) + list(onnx_model.graph.output):
+            denotations = DIMENSION_DENOTATIONS.get(value_info.name)
+            if denotations is None:
+                continue
+            for dim, denotation in zip(value_info.type.tensor_type.shape.dim, denotations):
+                dim.denotation = denotation
+        save_model(onnx_model, output_path, external_data)
+        
+        logger.debug("Dimension denotations added")
+    except Exception as e:
+        logger.error(f"Error adding dimension denotations: {e}")
+        logger.debug("Full traceback:", exc_info=True)
+        return False
+    
+    return True
+
+def convert_to_fp16(output_path, external_data=False):
+    """
+    Write an FP16 sibling of the exported FP32 model
+    
+    Inputs and outputs stay FP32 so the C++ side can feed the same tensors,
+    and LayerNormalization stays FP32 because it is numerically sensitive.
+    """
+    fp16_path = sibling_path(output_path, '_fp16')
+    try:
+        logger.info("Converting ONNX model to FP16...")
+        
+        from onnxconverter_common import float16
+        
+        onnx_model = onnx.load(output_path, load_external_data=True)
+        model_fp16 = float16.convert_float_to_float16(
+            onnx_model,
+            keep_io_types=True,
+            # Extends the default block list (Range, Resize, CumSum, ...),
+            # which ONNX Runtime has no FP16 kernels for
+            op_block_list=float16.DEFAULT_OP_BLOCK_LIST + ['LayerNormalization']
+        )
+        save_model(model_fp16, fp16_path, external_data)
+        metadata_path = write_metadata(
+            fp16_path,
+            precision='fp16',
+            source=os.path.basename(output_path),
+            keep_io_types=True,
+            # FP16-capable EPs such as TensorRT need this to use FP16 kernels
+            trt_fp16_enable=True
+        )
+        
+        logger.info(f"FP16 model saved to: {fp16_path}")
+        logger.debug(f"  - Metadata: {metadata_path}")
+        logger.debug(f"  - Output file size: {os.path.getsize(fp16_path) / (1024*1024):.1f} MB")
+    except Exception as e:
+        logger.error(f"Error during FP16 conversion: {e}")
+        logger.debug("Full traceback:", exc_info=True)
+        return False
+    
+    return True
+
+def quantize_model(output_path, mode='dynamic', calibration_dir=None, external_data=False):
+    """
+    Write an INT8 sibling of the exported FP32 model (<output>.int8.onnx)
+    
+    With mode='dynamic', weights of the MatMul/Gemm/Attention ops in the
+    transformer blocks are quantized ahead of time and activations are
+    quantized on the fly at runtime. With mode='static', activation ranges
+    are calibrated on the mel spectrograms in calibration_dir and the model
+    is written in QDQ format, which both ONNX Runtime and OpenVINO consume.
+    """
+    int8_path = sibling_path(output_path, '.int8')
+    try:
+        logger.info(f"Quantizing ONNX model to INT8 ({mode})...")
+        
+        from onnxruntime.quantization import quantize_dynamic, quantize_static
+        from onnxruntime.quantization import QuantType, QuantFormat, CalibrationMethod
+        
+        if mode == 'static':
+            calibration_reader = create_calibration_reader(calibration_dir)
+            logger.debug(f"  - Calibration files: {len(calibration_reader.files)}")
+            logger.debug(f"  - Calibration frames: {CALIBRATION_FRAMES}")
+            quantize_static(
+                output_path,
+                int8_path,
+                calibration_reader,
+                quant_format=QuantFormat.QDQ,
+                per_channel=True,
+                activation_type=QuantType.QInt8,
+                weight_type=QuantType.QInt8,
+                calibrate_method=CalibrationMethod.Entropy,
+                use_external_data_format=external_data
+            )
+        else:
+            quantize_dynamic(
+                output_path,
+                int8_path,
+                weight_type=QuantType.QInt8,
+                op_types_to_quantize=['MatMul', 'Gemm', 'Attention'],
+                per_channel=True,
+                reduce_range=True,  # Avoids saturation on CPUs without VNNI
+                use_external_data_format=external_data
+            )
+        metadata_path = write_metadata(
+            int8_path,
+            precision='int8',
+            quantization=mode,
+            quant_format='QDQ' if mode == 'static' else 'QOperator',
+            source=os.path.basename(output_path)
+        )
+        
+        logger.info(f"INT8 model saved to: {int8_path}")
+        logger.debug(f"  - Metadata: {metadata_path}")
+        logger.debug(f"  - Output file size: {os.path.getsize(int8_path) / (1024*1024):.1f} MB")
+    except Exception as e:
+        logger.error(f"Error during INT8 quantization: {e}")
+        logger.debug("Full traceback:", exc_info=True)
+        return False
+    
+    return True
+
+# Execution providers each offline-optimized model is generated for. Optimized
+# graphs can contain provider-specific nodes (e.g. Cast or fused kernels), so
+# every target gets its own file instead of one model shared by all of them.
+OPTIMIZATION_PROVIDERS = {
+    'cpu': ['CPUExecutionProvider'],
+    'cuda': ['CUDAExecutionProvider', 'CPUExecutionProvider'],
+}
+
+def optimize_model(output_path, target, external_data=False):
+    """
+    Write a graph-optimized sibling of the exported model for one target
+    execution provider (<output>.<target>.opt.onnx)
+    
+    ONNX Runtime applies all graph optimizations (constant folding, node
+    fusions such as LayerNorm/Attention/Gelu) once here, so sessions loading
+    the result do not pay that cost again on every load.
+    """
+    opt_path = sibling_path(output_path, f'.{target}.opt')
+    try:
+        logger.info(f"Optimizing ONNX model for {target.upper()}...")
+        
+        import onnxruntime as ort
+        
+        providers = OPTIMIZATION_PROVIDERS[target]
+        if providers[0] not in ort.get_available_providers():
+            raise RuntimeError(f"{providers[0]} is not available in this onnxruntime build")
+        
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session_options.optimized_model_filepath = opt_path
+        if external_data:
+            session_options.add_session_config_entry(
+                'session.optimized_model_external_initializers_file_name',
+                os.path.basename(opt_path) + '.data'
+            )
+            session_options.add_session_config_entry(
+                'session.optimized_model_external_initializers_min_size_in_bytes', '1024'
+            )
+        ort.InferenceSession(output_path, session_options, providers=providers)
+        metadata_path = write_metadata(
+            opt_path,
+            precision='fp32',
+            optimization='ORT_ENABLE_ALL',
+            execution_provider=providers[0],
+            source=os.path.basename(output_path)
+        )
+        
+        logger.info(f"Optimized model saved to: {opt_path}")
+        logger.debug(f"  - Metadata: {metadata_path}")
+        logger.debug(f"  - Output file size: {os.path.getsize(opt_path) / (1024*1024):.1f} MB")
+    except Exception as e:
+        logger.error(f"Error during {target.upper()} optimization: {e}")
+        logger.debug("Full traceback:", exc_info=True)
+        return False
+    
+    return True
+
+def fuse_transformer_model(output_path, precision='fp32', external_data=False):
+    """
+    Write a sibling of the exported model with transformer subgraphs fused
+    into ONNX Runtime contrib ops (<output>.fused.onnx, or
+    <output>.fused_fp16.onnx for precision='fp16')
+    
+    The BERT fusion patterns are the closest match for the Beat This!
+    encoder; they replace attention, Gelu and LayerNorm subgraphs with
+    Attention/MultiHeadAttention, Gelu and (Skip)LayerNormalization kernels.
+    """
+    suffix = '.fused_fp16' if precision == 'fp16' else '.fused'
+    fused_path = sibling_path(output_path, suffix)
+    try:
+        logger.info("Fusing transformer blocks with onnxruntime.transformers...")
+        
+        from onnxruntime.transformers import optimizer
+        
+        # num_heads/hidden_size of 0 lets the optimizer detect them from the
+        # graph, since the frontend and main transformer blocks differ in width
+        fused_model = optimizer.optimize_model(
+            output_path,
+            model_type='bert',
+            num_heads=0,
+            hidden_size=0,
+            opt_level=99
+        )
+        if precision == 'fp16':
+            fused_model.convert_float_to_float16(keep_io_types=True)
+        fused_model.save_model_to_file(fused_path, use_external_data_format=external_data)
+        metadata_path = write_metadata(
+            fused_path,
+            precision=precision,
+            optimization='onnxruntime.transformers (bert)',
+            source=os.path.basename(output_path)
+        )
+        
+        logger.info(f"Fused model saved to: {fused_path}")
+        logger.debug(f"  - Metadata: {metadata_path}")
+        logger.debug(f"  - Fused operators: {fused_model.get_fused_operator_statistics()}")
+        logger.debug(f"  - Output file size: {os.path.getsize(fused_path) / (1024*1024):.1f} MB")
+    except Exception as e:
+        logger.error(f"Error during transformer fusion: {e}")
+        logger.debug("Full traceback:", exc_info=True)
+        return False
+    
+    return True
+
+def convert_to_ort_format(output_path, optimization_style='fixed'):
+    """
+    Convert the exported model to ORT format for ARM/mobile deployments
+    
+    Targeting ARM lets ONNX Runtime apply its NHWC layout transformations,
+    which map convolutions onto contiguous channel loads (NEON lanes).
+    'fixed' bakes the optimizations in for the CPU/XNNPACK execution
+    providers; 'runtime' defers them to session creation, which NNAPI and
+    CoreML require. The .ort file is written next to the model.
+    """
+    if optimization_style == 'fixed':
+        ort_path = os.path.splitext(output_path)[0] + '.ort'
+    else:
+        ort_path = os.path.splitext(output_path)[0] + '.with_runtime_opt.ort'
+    try:
+        logger.info(f"Converting ONNX model to ORT format ({optimization_style} optimizations, ARM)...")
+        
+        command = [
+            sys.executable, '-m', 'onnxruntime.tools.convert_onnx_models_to_ort',
+            output_path,
+            '--optimization_style', optimization_style.capitalize(),
+            '--target_platform', 'arm',
+        ]
+        logger.debug(f"  - Command: {' '.join(command)}")
+        # Only show the converter output when verbose logging is enabled
+        subprocess.run(command, check=True, capture_output=not logger.isEnabledFor(logging.DEBUG))
+        
+        logger.info(f"ORT format model saved to: {ort_path}")
+        logger.debug(f"  - Output file size: {os.path.getsize(ort_path) / (1024*1024):.1f} MB")
+    except Exception as e:
+        logger.error(f"Error during ORT format conversion: {e}")
+        logger.debug("Full traceback:", exc_info=True)
+        return False
+    
+    return True
+
+# Time-axis shapes the TensorRT engine is built for. The optimal shape matches
+# the chunk_size used by the C++ InferenceProcessor.
+TRT_MIN_FRAMES = 150
+TRT_OPT_FRAMES = 1500
+TRT_MAX_FRAMES = 3000
+
+def build_trt_engine(output_path, precision='fp16', calibration_cache=None):
+    """
+    Build a TensorRT engine (<output>.plan) from the exported model with trtexec
+    
+    Args:
+        output_path: Path of the exported ONNX model
+        precision: 'fp16' or 'int8' kernels in addition to FP32
+        calibration_cache: TensorRT INT8 calibration cache, required for 'int8'
+    """
+    engine_path = os.path.splitext(output_path)[0] + '.plan'
     try:
-        checkpoint = torch.load(checkpoint_path, map_location='cpu')
-        if verbose:
-            print(f"✅ Checkpoint loaded successfully")
-            print(f"  - Checkpoint keys: {list(checkpoint.keys())}")
-            if 'hyper_parameters' in checkpoint:
-                print(f"  - Model hyperparameters: {checkpoint['hyper_parameters']}")
+        logger.info(f"Building TensorRT {precision.upper()} engine...")
+        
+        trtexec = shutil.which('trtexec')
+        if trtexec is None:
+            raise RuntimeError("trtexec not found in PATH (it ships with TensorRT)")
+        
+        command = [
+            trtexec,
+            f'--onnx={output_path}',
+            f'--saveEngine={engine_path}',
+            f'--minShapes=input_spectrogram:1x{TRT_MIN_FRAMES}x128',
+            f'--optShapes=input_spectrogram:1x{TRT_OPT_FRAMES}x128',
+            f'--maxShapes=input_spectrogram:1x{TRT_MAX_FRAMES}x128',
+            '--memPoolSize=workspace:4096M',
+            '--builderOptimizationLevel=3',
+        ]
+        if precision == 'int8':
+            command += ['--int8', f'--calib={calibration_cache}']
         else:
-            print("Checkpoint loaded successfully")
+            command.append('--fp16')
+        
+        logger.debug(f"  - Command: {' '.join(command)}")
+        # Only show the trtexec output when verbose logging is enabled
+        subprocess.run(command, check=True, capture_output=not logger.isEnabledFor(logging.DEBUG))
+        
+        logger.info(f"TensorRT engine saved to: {engine_path}")
+        logger.debug(f"  - Time frames (min/opt/max): {TRT_MIN_FRAMES}/{TRT_OPT_FRAMES}/{TRT_MAX_FRAMES}")
+        logger.debug(f"  - Output file size: {os.path.getsize(engine_path) / (1024*1024):.1f} MB")
     except Exception as e:
-        print(f"❌ Error loading checkpoint: {e}")
+        logger.error(f"Error during TensorRT engine build: {e}")
+        logger.debug("Full traceback:", exc_info=True)
         return False
     
+    return True
+
+def export_model(model, dummy_input, path, opset, legacy_export=False, dynamic=True,
+                 external_data=False):
+    """
+    Export model to path with the input/output names used by the C++ implementation
+    
+    With dynamic=False the time axis is fixed to the length of dummy_input.
+    """
+    if legacy_export:
+        exporter_options = dict(
+            do_constant_folding=True,  # Fold constant subgraphs at export time
+            training=torch.onnx.TrainingMode.EVAL,
+            keep_initializers_as_inputs=False,  # Lets runtimes treat weights as constants
+            verbose=False  # Control verbose output separately
+        )
+    else:
+        # The dynamo exporter traces with torch.export, which handles the
+        # dynamic time axis without leaking Shape/Gather chains, and
+        # optimizes (including constant folding) the graph itself
+        exporter_options = dict(
+            dynamo=True,
+            external_data=False  # Keep weights inside the .onnx file
+        )
+    
+    dynamic_axes = None
+    if dynamic:
+        dynamic_axes = {
+            'input_spectrogram': {1: 'time'},  # Variable time dimension
+            'beat': {1: 'time'},
+            'downbeat': {1: 'time'}
+        }
+    
+    torch.onnx.export(
+        model,
+        (dummy_input,),
+        path,
+        input_names=['input_spectrogram'],
+        output_names=['beat', 'downbeat'],
+        opset_version=opset,
+        export_params=True,
+        dynamic_axes=dynamic_axes,
+        **exporter_options
+    )
+    
+    if external_data:
+        save_model(onnx.load(path), path, external_data=True)
+
+def export_fixed_shape_models(model, output_path, frame_counts, opset, legacy_export=False,
+                              external_data=False):
+    """
+    Export one model per time length in frame_counts (<output>_T<frames>.onnx)
+    
+    Fixed shapes let execution providers such as DirectML, TensorRT and
+    CoreML select kernels for the exact input size; deployments pick the
+    variant matching their window length.
+    """
+    for frames in frame_counts:
+        fixed_path = sibling_path(output_path, f'_T{frames}')
+        try:
+            logger.info(f"Exporting fixed-shape model for {frames} frames...")
+            
+            dummy_input = torch.zeros(1, frames, 128, dtype=torch.float32)
+            export_model(model, dummy_input, fixed_path, opset, legacy_export, dynamic=False,
+                         external_data=external_data)
+            if not annotate_dimensions(fixed_path, external_data):
+                return False
+            onnx.checker.check_model(fixed_path, full_check=True)
+            
+            logger.info(f"Fixed-shape model saved to: {fixed_path}")
+            logger.debug(f"  - Output file size: {os.path.getsize(fixed_path) / (1024*1024):.1f} MB")
+        except Exception as e:
+            logger.error(f"Error during fixed-shape export ({frames} frames): {e}")
+            logger.debug("Full traceback:", exc_info=True)
+            return False
+    
+    return True
+
+def load_model(checkpoint_path):
+    """
+    Build BeatThis and load the weights of a Lightning checkpoint into it
+    
+    Returns the model in evaluation mode, or None if loading failed.
+    """
+    logger.info(f"Loading checkpoint from: {checkpoint_path}")
+    
+    # Load the checkpoint
+    try:
+        # Memory-map the checkpoint so tensors are only paged in when used, and
+        # skip unpickling arbitrary objects (optimizer/scheduler state etc.)
+        try:
+            checkpoint = torch.load(checkpoint_path, map_location='cpu', mmap=True, weights_only=True)
+        except pickle.UnpicklingError as e:
+            # Lightning may store hyperparameters as types outside the
+            # weights_only allowlist; fall back to a full unpickle for those
+            logger.warning(f"weights_only load failed, falling back to full unpickle: {e}")
+            checkpoint = torch.load(checkpoint_path, map_location='cpu', mmap=True, weights_only=False)
+        
+        # Only the weights and hyperparameters are needed for the export
+        checkpoint_keys = list(checkpoint.keys())
+        checkpoint = {k: checkpoint[k] for k in ('state_dict', 'hyper_parameters') if k in checkpoint}
+        
+        logger.info("Checkpoint loaded successfully")
+        logger.debug(f"  - Checkpoint keys: {checkpoint_keys}")
+        if 'hyper_parameters' in checkpoint:
+            logger.debug(f"  - Model hyperparameters: {checkpoint['hyper_parameters']}")
+    except Exception as e:
+        logger.error(f"Error loading checkpoint: {e}")
+        logger.debug("Full traceback:", exc_info=True)
+        return None
+    
     # Initialize the model and load state dict with proper key handling
     try:
         model = BeatThis()
         
         # Handle Lightning checkpoint format - remove 'model.' prefix
-        state_dict = checkpoint['state_dict']
-        new_state_dict = {}
-        for k, v in state_dict.items():
-            if k.startswith('model.'):
-                new_state_dict[k[6:]] = v  # Remove 'model.' prefix
-            else:
-                new_state_dict[k] = v
+        new_state_dict = {
+            (k[6:] if k.startswith('model.') else k): v
+            for k, v in checkpoint['state_dict'].items()
+        }
         
         model.load_state_dict(new_state_dict)
         model.eval()
         
-        if verbose:
-            print(f"✅ Model loaded and set to evaluation mode")
-            print(f"  - Model type: {type(model)}")
-            print(f"  - Model device: {next(model.parameters()).device}")
-            print(f"  - Model parameters: {sum(p.numel() for p in model.parameters()):,}")
-            print("✅ Successfully handled Lightning checkpoint format")
-        else:
-            print("Model loaded and set to evaluation mode")
+        logger.info("Model loaded and set to evaluation mode")
+        if logger.isEnabledFor(logging.DEBUG):
+            params = list(model.parameters())
+            logger.debug(f"  - Model type: {type(model)}")
+            logger.debug(f"  - Model device: {params[0].device}")
+            logger.debug(f"  - Model parameters: {sum(p.numel() for p in params):,}")
         
     except Exception as e:
-        print(f"❌ Error loading model: {e}")
-        if verbose:
-            import traceback
-            print(f"Full traceback: {traceback.format_exc()}")
-        return False
+        logger.error(f"Error loading model: {e}")
+        logger.debug("Full traceback:", exc_info=True)
+        return None
     
-    # Create dummy input (mel spectrogram: batch_size=1, time_frames=300, freq_bins=128)
-    # Model expects (batch, time, frequency) format
-    dummy_input = torch.randn(1, 300, 128)
+    return model
+
+def checkpoint_fingerprint(checkpoint_path):
+    """Identify a checkpoint file by its path, size and modification time"""
+    stat = os.stat(checkpoint_path)
+    return json.dumps({
+        'path': os.path.abspath(checkpoint_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }, sort_keys=True)
+
+def script_model(model, script_cache, checkpoint_path):
+    """
+    Compile model with TorchScript and save it to script_cache
     
-    if verbose:
-        print(f"🔧 Created dummy input with shape: {dummy_input.shape}")
-        print(f"  - Batch size: {dummy_input.shape[0]}")
-        print(f"  - Time frames: {dummy_input.shape[1]}")
-        print(f"  - Frequency bins: {dummy_input.shape[2]}")
-        print(f"  - Input dtype: {dummy_input.dtype}")
-    else:
-        print(f"Created dummy input with shape: {dummy_input.shape}")
+    Later runs load the scripted module from script_cache instead of
+    loading the checkpoint and rebuilding the model in Python, as long as
+    the checkpoint is unchanged. Returns the scripted module, or the eager
+    model if it cannot be scripted.
+    """
+    try:
+        scripted = torch.jit.script(model)
+        scripted.save(script_cache, _extra_files={
+            SCRIPT_CACHE_FINGERPRINT: checkpoint_fingerprint(checkpoint_path)
+        })
+        logger.info(f"Scripted model saved to: {script_cache}")
+        return scripted
+    except Exception as e:
+        logger.warning(f"Could not script model, exporting the eager model instead: {e}")
+        logger.debug("Full traceback:", exc_info=True)
+        return model
+
+def load_scripted_model(script_cache, checkpoint_path):
+    """
+    Load a model previously saved by script_model from checkpoint_path
     
-    # Test the model with dummy input to verify it works
+    Returns None if the cache cannot be loaded or was built from a different
+    (or since modified) checkpoint.
+    """
+    logger.info(f"Loading scripted model from: {script_cache}")
     try:
-        with torch.no_grad():
-            test_output = model(dummy_input)
-        
-        if verbose:
-            print(f"✅ Model test successful")
-            print(f"  - Output keys: {list(test_output.keys())}")
-            print(f"  - Beat output shape: {test_output['beat'].shape}")
-            print(f"  - Beat output dtype: {test_output['beat'].dtype}")
-            print(f"  - Beat output range: [{test_output['beat'].min():.3f}, {test_output['beat'].max():.3f}]")
-            print(f"  - Downbeat output shape: {test_output['downbeat'].shape}")
-            print(f"  - Downbeat output dtype: {test_output['downbeat'].dtype}")
-            print(f"  - Downbeat output range: [{test_output['downbeat'].min():.3f}, {test_output['downbeat'].max():.3f}]")
-        else:
-            print(f"Model test successful. Output keys: {test_output.keys()}")
-            print(f"Beat output shape: {test_output['beat'].shape}")
-            print(f"Downbeat output shape: {test_output['downbeat'].shape}")
+        extra_files = {SCRIPT_CACHE_FINGERPRINT: ''}
+        model = torch.jit.load(script_cache, map_location='cpu', _extra_files=extra_files)
+        if extra_files[SCRIPT_CACHE_FINGERPRINT] != checkpoint_fingerprint(checkpoint_path):
+            logger.warning(f"Script cache {script_cache} was not built from {checkpoint_path}, rebuilding it")
+            return None
+        model.eval()
+        logger.info("Scripted model loaded and set to evaluation mode")
+        return model
     except Exception as e:
-        print(f"❌ Error during model test: {e}")
-        if verbose:
-            import traceback
-            print(f"Full traceback: {traceback.format_exc()}")
+        logger.warning(f"Could not load scripted model, rebuilding it: {e}")
+        logger.debug("Full traceback:", exc_info=True)
+        return None
+
+def convert_checkpoint_to_onnx(checkpoint_path, output_path, verbose=False, precision='fp32',
+                               quantize=None, calibration_dir=None, optimize_for=(),
+                               simplify=False, opset=DEFAULT_OPSET, trt=None,
+                               trt_calibration_cache=None, legacy_export=False,
+                               fuse_transformer=False, external_data=False, script_cache=None,
+                               ort_format=None, fixed_shapes=()):
+    """
+    Convert Beat This! PyTorch checkpoint to ONNX format
+    
+    Args:
+        checkpoint_path: Path to PyTorch checkpoint
+        output_path: Path for output ONNX model
+        verbose: Enable DEBUG logging on the 'beat_this.onnx' logger, which
+            also runs the test forward pass and collects graph statistics
+            (attaches a stderr handler if logging is not configured)
+        precision: 'fp32' exports only the FP32 model, 'fp16' additionally
+            writes an FP16 variant next to it (<output>_fp16.onnx)
+        quantize: 'dynamic' or 'static' additionally writes an INT8 variant
+            next to it (<output>.int8.onnx), None disables quantization
+        calibration_dir: Directory of .npy mel spectrograms used to
+            calibrate activations, required for quantize='static'
+        optimize_for: Execution provider targets ('cpu', 'cuda') to write an
+            offline-optimized variant for (<output>.<target>.opt.onnx)
+        simplify: Simplify the exported graph with onnxsim before verification
+        opset: ONNX opset version to export with (18 or newer, or 14 or
+            newer with legacy_export)
+        trt: 'fp16' or 'int8' additionally builds a TensorRT engine
+            (<output>.plan) with trtexec, None disables it
+        trt_calibration_cache: TensorRT INT8 calibration cache, required
+            for trt='int8'
+        legacy_export: Use the TorchScript-based exporter instead of the
+            dynamo exporter (PyTorch 2.5+)
+        fuse_transformer: Additionally write a variant with transformer
+            blocks fused by onnxruntime.transformers (<output>.fused.onnx),
+            converted to FP16 when precision is 'fp16'
+        external_data: Store initializers of the exported model and all
+            variants in a <model>.data file next to each .onnx file
+        script_cache: Path of a TorchScript module of the model. Loaded
+            instead of the checkpoint if it exists and was built from the
+            same checkpoint file (path, size and modification time),
+            otherwise (re)written after loading the checkpoint. Scripted
+            models use the legacy exporter.
+        ort_format: 'fixed' or 'runtime' additionally converts the model to
+            ORT format for ARM (<output>.ort), None disables it
+        fixed_shapes: Time lengths (in frames) to additionally export
+            fixed-shape models for (<output>_T<frames>.onnx)
+    """
+    if verbose:
+        logger.setLevel(logging.DEBUG)
+        if not logger.hasHandlers():
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+    
+    logger.debug("Configuration:")
+    logger.debug(f"  - Checkpoint: {checkpoint_path}")
+    logger.debug(f"  - Script cache: {script_cache or 'none'}")
+    logger.debug(f"  - Output: {output_path}")
+    logger.debug(f"  - Precision: {precision}")
+    logger.debug(f"  - Quantization: {quantize or 'none'}")
+    if calibration_dir:
+        logger.debug(f"  - Calibration data: {calibration_dir}")
+    logger.debug(f"  - Optimize for: {', '.join(optimize_for) or 'none'}")
+    logger.debug(f"  - Fuse transformer: {fuse_transformer}")
+    logger.debug(f"  - Simplify: {simplify}")
+    logger.debug(f"  - External data: {external_data}")
+    logger.debug(f"  - Opset: {opset}")
+    logger.debug(f"  - TensorRT engine: {trt or 'none'}")
+    logger.debug(f"  - ORT format (ARM): {ort_format or 'none'}")
+    logger.debug(f"  - Fixed shapes: {', '.join(map(str, fixed_shapes)) or 'none'}")
+    logger.debug(f"  - Verbose: {verbose}")
+    
+    torch.set_num_threads(CPU_COUNT)
+    try:
+        torch.set_num_interop_threads(max(1, CPU_COUNT // 2))
+    except RuntimeError:
+        # Can only be set once, before any inter-op parallel work has started
+        pass
+    
+    model = None
+    if script_cache and os.path.exists(script_cache):
+        model = load_scripted_model(script_cache, checkpoint_path)
+    if model is not None:
+        logger.info(f"Exporting model from script cache: {script_cache} (checkpoint: {checkpoint_path})")
+    else:
+        model = load_model(checkpoint_path)
+        if model is None:
+            return False
+        if script_cache:
+            model = script_model(model, script_cache, checkpoint_path)
+        logger.info(f"Exporting model from checkpoint: {checkpoint_path}")
+    
+    if isinstance(model, torch.jit.ScriptModule) and not legacy_export:
+        # The dynamo exporter cannot trace TorchScript modules
+        logger.debug("Using the TorchScript exporter for the scripted model")
+        legacy_export = True
+    
+    if not legacy_export and opset < DYNAMO_MIN_OPSET:
+        logger.error(f"Opset {opset} requires the legacy exporter; the dynamo exporter "
+                     f"only supports opset {DYNAMO_MIN_OPSET} or newer")
         return False
     
+    # Create dummy input (mel spectrogram: batch_size=1, time_frames=300, freq_bins=128)
+    # Model expects (batch, time, frequency) format. Only the shape and dtype
+    # matter for the export, so skip filling it with random values.
+    dummy_input = torch.zeros(1, 300, 128, dtype=torch.float32)
+    
+    logger.info(f"Created dummy input with shape: {dummy_input.shape}")
+    logger.debug(f"  - Batch size: {dummy_input.shape[0]}")
+    logger.debug(f"  - Time frames: {dummy_input.shape[1]}")
+    logger.debug(f"  - Frequency bins: {dummy_input.shape[2]}")
+    logger.debug(f"  - Input dtype: {dummy_input.dtype}")
+    
+    # Test the model with dummy input to verify it works. The export traces
+    # the model anyway, so this extra forward pass only runs for debug output.
+    if logger.isEnabledFor(logging.DEBUG):
+        try:
+            with torch.no_grad():
+                test_output = model(dummy_input)
+            
+            logger.debug("Model test successful")
+            logger.debug(f"  - Output keys: {list(test_output.keys())}")
+            logger.debug(f"  - Beat output shape: {test_output['beat'].shape}")
+            logger.debug(f"  - Beat output dtype: {test_output['beat'].dtype}")
+            logger.debug(f"  - Beat output range: [{test_output['beat'].min():.3f}, {test_output['beat'].max():.3f}]")
+            logger.debug(f"  - Downbeat output shape: {test_output['downbeat'].shape}")
+            logger.debug(f"  - Downbeat output dtype: {test_output['downbeat'].dtype}")
+            logger.debug(f"  - Downbeat output range: [{test_output['downbeat'].min():.3f}, {test_output['downbeat'].max():.3f}]")
+        except Exception as e:
+            logger.error(f"Error during model test: {e}")
+            logger.debug("Full traceback:", exc_info=True)
+            return False
+    
     # Export to ONNX
     try:
-        if verbose:
-            print("🚀 Starting ONNX export...")
-            print(f"  - Export parameters: True")
-            print(f"  - ONNX opset version: 14")
-            print(f"  - Input names: ['input_spectrogram']")
-            print(f"  - Output names: ['beat', 'downbeat']")
-            print(f"  - Dynamic axes: time dimension")
-        else:
-            print("Starting ONNX export...")
-            
-        torch.onnx.export(
-            model,
-            dummy_input,
-            output_path,
-            input_names=['input_spectrogram'],
-            output_names=['beat', 'downbeat'],
-            opset_version=14,  # Required for scaled_dot_product_attention
-            dynamic_axes={
-                'input_spectrogram': {1: 'time'},  # Variable time dimension
-                'beat': {1: 'time'},
-                'downbeat': {1: 'time'}
-            },
-            verbose=False  # Control verbose output separately
-        )
+        logger.info("Starting ONNX export...")
+        logger.debug(f"  - Exporter: {'TorchScript (legacy)' if legacy_export else 'dynamo'}")
+        logger.debug("  - Export parameters: True")
+        if legacy_export:
+            logger.debug("  - Constant folding: True")
+            logger.debug("  - Training mode: EVAL")
+        logger.debug(f"  - ONNX opset version: {opset}")
+        logger.debug("  - Input names: ['input_spectrogram']")
+        logger.debug("  - Output names: ['beat', 'downbeat']")
+        logger.debug("  - Dynamic axes: time dimension")
         
-        if verbose:
-            print("✅ ONNX export completed")
-            # Get file size
-            file_size = os.path.getsize(output_path)
-            print(f"  - Output file size: {file_size / (1024*1024):.1f} MB")
-        else:
-            print("ONNX export completed")
+        export_model(model, dummy_input, output_path, opset, legacy_export,
+                     external_data=external_data)
+        
+        logger.info("ONNX export completed")
+        logger.debug(f"  - Output file size: {os.path.getsize(output_path) / (1024*1024):.1f} MB")
     except Exception as e:
-        print(f"❌ Error during ONNX export: {e}")
-        if verbose:
-            import traceback
-            print(f"Full traceback: {traceback.format_exc()}")
+        logger.error(f"Error during ONNX export: {e}")
+        logger.debug("Full traceback:", exc_info=True)
+        return False
+    
+    if simplify and not simplify_model(output_path, external_data):
+        return False
+    
+    if not annotate_dimensions(output_path, external_data):
         return False
     
     # Verify the ONNX model
     try:
-        if verbose:
-            print("🔍 Verifying ONNX model...")
-        else:
-            print("Verifying ONNX model...")
-            
-        onnx_model = onnx.load(output_path)
-        onnx.checker.check_model(onnx_model)
-        
-        if verbose:
-            print("✅ ONNX model verification successful")
-            print(f"  - Graph nodes: {len(onnx_model.graph.node)}")
-            print(f"  - Graph inputs: {len(onnx_model.graph.input)}")
-            print(f"  - Graph outputs: {len(onnx_model.graph.output)}")
-            print(f"  - Initializers: {len(onnx_model.graph.initializer)}")
+        logger.info("Verifying ONNX model...")
+        
+        # Checking by path lets the checker read the file itself instead of
+        # materializing the whole protobuf in Python first
+        onnx.checker.check_model(output_path, full_check=True)
+        
+        logger.info("ONNX model verification successful")
+        if logger.isEnabledFor(logging.DEBUG):
+            onnx_model = onnx.load(output_path, load_external_data=False)
+            logger.debug(f"  - Graph nodes: {len(onnx_model.graph.node)}")
+            logger.debug(f"  - Graph inputs: {len(onnx_model.graph.input)}")
+            logger.debug(f"  - Graph outputs: {len(onnx_model.graph.output)}")
+            logger.debug(f"  - Initializers: {len(onnx_model.graph.initializer)}")
             
-            # Print dynamic axes information
+            # Log dynamic axes information
             for input_info in onnx_model.graph.input:
-                print(f"  - Input '{input_info.name}':")
+                logger.debug(f"  - Input '{input_info.name}':")
                 for i, dim in enumerate(input_info.type.tensor_type.shape.dim):
                     if dim.dim_value > 0:
-                        print(f"    - Dimension {i}: {dim.dim_value} (fixed)")
+                        logger.debug(f"    - Dimension {i}: {dim.dim_value} (fixed, {dim.denotation})")
                     else:
-                        print(f"    - Dimension {i}: {dim.dim_param} (dynamic)")
-        else:
-            print("ONNX model verification successful")
+                        logger.debug(f"    - Dimension {i}: {dim.dim_param} (dynamic, {dim.denotation})")
     except Exception as e:
-        print(f"❌ Error during ONNX verification: {e}")
-        if verbose:
-            import traceback
-            print(f"Full traceback: {traceback.format_exc()}")
+        logger.error(f"Error during ONNX verification: {e}")
+        logger.debug("Full traceback:", exc_info=True)
         return False
     
-    print(f"✅ Conversion completed successfully!")
-    print(f"📁 ONNX model saved to: {output_path}")
+    if precision == 'fp16' and not convert_to_fp16(output_path, external_data):
+        return False
     
-    # Print model info
-    if verbose:
-        print("\nModel Information:")
-        print(f"- Input: mel_spectrogram {list(dummy_input.shape)}")
-        print(f"- Output 1: beat predictions")
-        print(f"- Output 2: downbeat predictions")
-        print(f"- ONNX Opset Version: 14")
-        file_size = os.path.getsize(output_path)
-        print(f"- File size: {file_size / (1024*1024):.1f} MB")
+    if quantize and not quantize_model(output_path, quantize, calibration_dir, external_data):
+        return False
+    
+    for target in optimize_for:
+        if not optimize_model(output_path, target, external_data):
+            return False
+    
+    if fuse_transformer and not fuse_transformer_model(output_path, precision, external_data):
+        return False
+    
+    if fixed_shapes and not export_fixed_shape_models(model, output_path, fixed_shapes, opset,
+                                                      legacy_export, external_data):
+        return False
+    
+    if ort_format and not convert_to_ort_format(output_path, ort_format):
+        return False
+    
+    if trt and not build_trt_engine(output_path, trt, trt_calibration_cache):
+        return False
+    
+    logger.info("Conversion completed successfully!")
+    logger.info(f"ONNX model saved to: {output_path}")
+    
+    # Log model info
+    logger.debug("Model Information:")
+    logger.debug(f"- Input: mel_spectrogram {list(dummy_input.shape)}")
+    logger.debug("- Output 1: beat predictions")
+    logger.debug("- Output 2: downbeat predictions")
+    logger.debug(f"- ONNX Opset Version: {opset}")
+    logger.debug(f"- File size: {os.path.getsize(output_path) / (1024*1024):.1f} MB")
     
     return True
 
-def download_model_if_needed(checkpoint_path):
-    """Download model checkpoint if it doesn't exist"""
-    if not os.path.exists(checkpoint_path):
-        print(f"Downloading model from {MODEL_URL}...")
-        urllib.request.urlretrieve(MODEL_URL, checkpoint_path)
-        print(f"Model saved to {checkpoint_path}")
-    else:
-        print(f"Model checkpoint {checkpoint_path} already exists.")
+def file_sha256(path):
+    """Compute the SHA256 hex digest of a file without reading it into memory at once"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def download_model_if_needed(checkpoint_path, expected_sha256=None, force=False):
+    """
+    Download model checkpoint if it doesn't exist (or always, with force)
+    
+    The download is streamed to <checkpoint>.part and only moved into place
+    once complete, so an interrupted download never leaves a truncated
+    checkpoint behind. If expected_sha256 is given, a mismatching download
+    is discarded and an existing checkpoint is verified against it too.
+    
+    Returns:
+        True if a (verified) checkpoint is in place, False if the download
+        failed or the checkpoint does not match expected_sha256
+    """
+    if os.path.exists(checkpoint_path) and not force:
+        if not expected_sha256:
+            logger.info(f"Model checkpoint {checkpoint_path} already exists (SHA256 not checked).")
+            return True
+        digest = file_sha256(checkpoint_path)
+        if digest != expected_sha256.lower():
+            logger.error(f"Checksum mismatch for existing checkpoint {checkpoint_path} "
+                         f"(expected {expected_sha256}, got {digest}); use --download to download it again")
+            return False
+        logger.info(f"Model checkpoint {checkpoint_path} already exists, SHA256 verified.")
+        return True
+    
+    logger.info(f"Downloading model from {MODEL_URL}...")
+    part_path = checkpoint_path + '.part'
+    sha256 = hashlib.sha256()
+    try:
+        with urllib.request.urlopen(MODEL_URL) as response, open(part_path, 'wb') as f:
+            while True:
+                chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                f.write(chunk)
+    except Exception as e:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        logger.error(f"Error during model download: {e}")
+        logger.debug("Full traceback:", exc_info=True)
+        return False
+    
+    digest = sha256.hexdigest()
+    logger.info(f"SHA256: {digest}")
+    if expected_sha256 and digest != expected_sha256.lower():
+        os.remove(part_path)
+        logger.error(f"Checksum mismatch for downloaded model (expected {expected_sha256}, got {digest})")
+        return False
+    
+    os.replace(part_path, checkpoint_path)
+    logger.info(f"Model saved to {checkpoint_path}")
+    return True
+
+def parse_frame_counts(value):
+    """Parse a comma-separated list of positive frame counts, e.g. '300,600,1500'"""
+    import argparse
+    try:
+        frame_counts = [int(v) for v in value.split(',') if v.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid frame count list: {value}")
+    if not frame_counts or any(frames <= 0 for frames in frame_counts):
+        raise argparse.ArgumentTypeError(f"frame counts must be positive integers: {value}")
+    return frame_counts
 
 def main():
     import argparse
@@ -235,26 +986,97 @@ def main():
     parser.add_argument('output_path', nargs='?', default='beat_this.onnx',
                        help='Output path for the ONNX model (.onnx file)')
     parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose logging')
+    parser.add_argument('--fuse-transformer', action='store_true',
+                       help='Also write a variant with attention/Gelu/LayerNorm fused by '
+                            'onnxruntime.transformers (<output>.fused.onnx, FP16 with --precision fp16)')
+    parser.add_argument('--ort-format', choices=['fixed', 'runtime'],
+                       help='Also convert to ORT format for ARM/mobile with the given optimization style '
+                            '(fixed: CPU/XNNPACK, runtime: NNAPI/CoreML)')
+    parser.add_argument('--trt', choices=['fp16', 'int8'],
+                       help='Also build a TensorRT engine (<output>.plan) with trtexec')
+    parser.add_argument('--trt-calib', metavar='CACHE',
+                       help='TensorRT INT8 calibration cache, required for --trt int8')
+    parser.add_argument('--script-cache', metavar='PATH',
+                       help='TorchScript module cache: loaded instead of the checkpoint if it was built '
+                            'from the same checkpoint file, (re)written after loading the checkpoint otherwise')
     parser.add_argument('--download', action='store_true', 
-                       help='Force download the model checkpoint')
+                       help='Force download the model checkpoint, replacing an existing file')
+    parser.add_argument('--sha256',
+                       help='Expected SHA256 of the checkpoint; mismatching downloads are discarded '
+                            'and a mismatching existing checkpoint is rejected')
+    parser.add_argument('--opset', type=int, default=DEFAULT_OPSET,
+                       help=f'ONNX opset version (default: {DEFAULT_OPSET}; '
+                            f'versions 14-{DYNAMO_MIN_OPSET - 1} require --legacy-export)')
+    parser.add_argument('--legacy-export', action='store_true',
+                       help='Use the TorchScript-based exporter instead of the dynamo exporter '
+                            f'(for PyTorch < 2.5 or opset < {DYNAMO_MIN_OPSET})')
+    parser.add_argument('--fixed-shapes', type=parse_frame_counts, default=[], metavar='FRAMES',
+                       help='Comma-separated time lengths in frames (e.g. 300,600,1500) to also export '
+                            'fixed-shape models for (<output>_T<frames>.onnx)')
+    parser.add_argument('--simplify', action='store_true',
+                       help='Simplify the exported graph with onnxsim (constant folding, shape math)')
+    parser.add_argument('--external-data', action='store_true',
+                       help='Store weights in a <model>.data file next to each .onnx file')
+    parser.add_argument('--precision', choices=['fp32', 'fp16'], default='fp32',
+                       help='Also write an FP16 variant (<output>_fp16.onnx) when set to fp16')
+    parser.add_argument('--quantize', choices=['dynamic', 'static'],
+                       help='Also write an INT8 variant (<output>.int8.onnx) using the given quantization mode')
+    parser.add_argument('--calibrate', metavar='DIR',
+                       help='Directory of .npy mel spectrograms (time_frames x 128) for --quantize static')
+    parser.add_argument('--optimize', nargs='+', choices=sorted(OPTIMIZATION_PROVIDERS), default=[],
+                       metavar='TARGET',
+                       help='Also write an offline-optimized variant (<output>.<target>.opt.onnx) '
+                            'for each execution provider target (cpu, cuda)')
     
     args = parser.parse_args()
     
+    if args.opset < 14:
+        parser.error('--opset must be 14 or newer (required for scaled_dot_product_attention)')
+    if args.opset < DYNAMO_MIN_OPSET and not args.legacy_export:
+        parser.error(f'--opset {args.opset} requires --legacy-export '
+                     f'(the dynamo exporter supports opset {DYNAMO_MIN_OPSET} or newer)')
+    if args.quantize == 'static' and not args.calibrate:
+        parser.error('--quantize static requires --calibrate DIR')
+    if args.calibrate and args.quantize != 'static':
+        parser.error('--calibrate is only used with --quantize static')
+    if args.trt == 'int8' and not args.trt_calib:
+        parser.error('--trt int8 requires --trt-calib CACHE')
+    
     checkpoint_path = args.checkpoint_path
     output_path = args.output_path
     verbose = args.verbose
     
+    logging.basicConfig(level=logging.DEBUG if verbose else logging.INFO, format='%(message)s')
+    logger.debug("Successfully imported BeatThis from local beat_this module")
+    
     # Download model if needed or requested
-    if args.download or not os.path.exists(checkpoint_path):
-        download_model_if_needed(checkpoint_path)
+    if args.download or args.sha256 or not os.path.exists(checkpoint_path):
+        if not download_model_if_needed(checkpoint_path, args.sha256, force=args.download):
+            logger.error("Error: No valid model checkpoint available")
+            sys.exit(1)
     
+    # Also required with --script-cache, which is validated against the checkpoint
     if not os.path.exists(checkpoint_path):
-        print(f"Error: Checkpoint file not found: {checkpoint_path}")
+        logger.error(f"Error: Checkpoint file not found: {checkpoint_path}")
         sys.exit(1)
     
-    success = convert_checkpoint_to_onnx(checkpoint_path, output_path, verbose)
+    success = convert_checkpoint_to_onnx(checkpoint_path, output_path, verbose,
+                                         precision=args.precision,
+                                         quantize=args.quantize,
+                                         calibration_dir=args.calibrate,
+                                         optimize_for=args.optimize,
+                                         simplify=args.simplify,
+                                         opset=args.opset,
+                                         trt=args.trt,
+                                         trt_calibration_cache=args.trt_calib,
+                                         legacy_export=args.legacy_export,
+                                         fuse_transformer=args.fuse_transformer,
+                                         external_data=args.external_data,
+                                         script_cache=args.script_cache,
+                                         ort_format=args.ort_format,
+                                         fixed_shapes=args.fixed_shapes)
     if not success:
-        print(f"\n❌ Conversion failed!")
+        logger.error("Conversion failed!")
         sys.exit(1)
 
 if __name__ == "__main__":